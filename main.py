@@ -62,8 +62,11 @@ ALLOTMENT_BLOCKS_URL = "https://api.cloudbeds.com/api/v1.3/getAllotmentBlocks"
 RESERVATIONS_URL = "https://api.cloudbeds.com/api/v1.3/getReservations"
 RESERVATION_DETAIL_URL = "https://api.cloudbeds.com/api/v1.3/getReservation"
 
-def make_api_call(url, params, credentials):
-    """Make API call to Cloudbeds using API Key authentication"""
+def make_api_call(url, params, credentials, session=None):
+    """Make API call to Cloudbeds using API Key authentication
+
+    Pass a requests.Session to reuse pooled connections across calls.
+    """
     headers = {
         "x-api-key": credentials['api_key'],
         "Accept": "application/json",
@@ -71,7 +74,7 @@ def make_api_call(url, params, credentials):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = (session or requests).get(url, headers=headers, params=params, timeout=30)
         print(f"🔗 API call to {url} - Status: {response.status_code}")
         
         if response.status_code == 200:
@@ -81,7 +84,7 @@ def make_api_call(url, params, credentials):
         elif response.status_code == 403:
             return {'success': False, 'error': "Access forbidden. Please check your API permissions."}
         elif response.status_code == 429:
-            return {'success': False, 'error': "Rate limit exceeded. Please try again in a few minutes."}
+            return {'success': False, 'retryable': True, 'error': "Rate limit exceeded. Please try again in a few minutes."}
         else:
             try:
                 error_data = response.json()
@@ -90,9 +93,9 @@ def make_api_call(url, params, credentials):
                 error_msg = response.text
             return {'success': False, 'error': f"API Error: {response.status_code} - {error_msg}"}
     except requests.exceptions.Timeout:
-        return {'success': False, 'error': "Request timed out. Please check your internet connection."}
+        return {'success': False, 'retryable': True, 'error': "Request timed out. Please check your internet connection."}
     except requests.exceptions.ConnectionError:
-        return {'success': False, 'error': "Connection error. Please check your internet connection."}
+        return {'success': False, 'retryable': True, 'error': "Connection error. Please check your internet connection."}
     except Exception as e:
         return {'success': False, 'error': f"Connection error: {str(e)}"}
 
@@ -236,6 +239,87 @@ def generate_group_allotment_report(allotment_blocks, start_date, end_date):
         'groups': groups_array
     }
 
+def fetch_group_allotment_report(credentials, start_date, end_date, api_call=make_api_call):
+    """Fetch allotment blocks for a date range and build the group report"""
+    print(f"🚀 Fetching group allotment report for {start_date} to {end_date}")
+    
+    # Fetch allotment blocks
+    print("📦 Fetching allotment blocks...")
+    allotment_response = api_call(ALLOTMENT_BLOCKS_URL, {
+        'propertyID': credentials['property_id'],
+        'startDate': start_date,
+        'endDate': end_date
+    }, credentials)
+    
+    if not allotment_response['success']:
+        return {'success': False, 'error': f"Failed to fetch allotment blocks: {allotment_response['error']}"}
+    
+    allotment_blocks = allotment_response['data'].get('data', [])
+    print(f"Found {len(allotment_blocks)} allotment blocks")
+    
+    # Process and group the data
+    report_data = generate_group_allotment_report(allotment_blocks, start_date, end_date)
+    
+    print(f"✅ Generated report with {len(report_data['groups'])} groups")
+    
+    return {'success': True, 'data': report_data}
+
+def fetch_block_reservations(credentials, allotment_block_code, start_date, end_date, api_call=make_api_call, strict=False):
+    """Fetch detailed reservations for an allotment block checking in within a date range
+
+    By default a reservation whose details cannot be fetched is kept with its summary data only;
+    with strict=True the whole fetch fails instead.
+    """
+    print(f"🚀 Fetching reservations for allotment block: {allotment_block_code}")
+    
+    reservations_response = api_call(RESERVATIONS_URL, {
+        'propertyID': credentials['property_id'],
+        'checkInFrom': start_date,
+        'checkInTo': end_date,
+        'includeGuestsDetails': 'true'
+    }, credentials)
+    
+    if not reservations_response['success']:
+        return {'success': False, 'error': f"Failed to fetch reservations: {reservations_response['error']}"}
+    
+    all_reservations = reservations_response['data'].get('data', [])
+    print(f"Found {len(all_reservations)} total reservations in date range")
+    
+    # Filter reservations that match the allotment block code
+    filtered_reservations = [
+        res for res in all_reservations 
+        if res.get('allotmentBlockCode') == allotment_block_code
+    ]
+    
+    print(f"Found {len(filtered_reservations)} reservations for allotment block {allotment_block_code}")
+    
+    # Fetch detailed information for each reservation
+    detailed_reservations = []
+    for reservation in filtered_reservations:
+        reservation_id = reservation.get('reservationID')
+        if reservation_id:
+            print(f"Fetching details for reservation: {reservation_id}")
+            
+            detail_response = api_call(RESERVATION_DETAIL_URL, {
+                'propertyID': credentials['property_id'],
+                'reservationID': reservation_id
+            }, credentials)
+            
+            if detail_response['success']:
+                detailed_data = detail_response['data'].get('data', {})
+                # Merge the detailed data with the basic reservation data
+                merged_reservation = {**reservation, **detailed_data}
+                detailed_reservations.append(merged_reservation)
+            elif strict:
+                return {'success': False, 'error': f"Failed to fetch details for reservation {reservation_id}: {detail_response['error']}"}
+            else:
+                print(f"Failed to fetch details for reservation {reservation_id}: {detail_response['error']}")
+                detailed_reservations.append(reservation)
+        else:
+            detailed_reservations.append(reservation)
+    
+    return {'success': True, 'data': detailed_reservations}
+
 # Routes
 @app.route('/')
 def index():
@@ -362,28 +446,7 @@ def group_allotment_report():
     start_date = request.args.get('start_date', '2025-01-01')
     end_date = request.args.get('end_date', '2025-12-31')
     
-    print(f"🚀 Fetching group allotment report for {start_date} to {end_date}")
-    
-    # Fetch allotment blocks
-    print("📦 Fetching allotment blocks...")
-    allotment_response = make_api_call(ALLOTMENT_BLOCKS_URL, {
-        'propertyID': credentials['property_id'],
-        'startDate': start_date,
-        'endDate': end_date
-    }, credentials)
-    
-    if not allotment_response['success']:
-        return jsonify({'success': False, 'error': f"Failed to fetch allotment blocks: {allotment_response['error']}"})
-    
-    allotment_blocks = allotment_response['data'].get('data', [])
-    print(f"Found {len(allotment_blocks)} allotment blocks")
-    
-    # Process and group the data
-    report_data = generate_group_allotment_report(allotment_blocks, start_date, end_date)
-    
-    print(f"✅ Generated report with {len(report_data['groups'])} groups")
-    
-    return jsonify({'success': True, 'data': report_data})
+    return jsonify(fetch_group_allotment_report(credentials, start_date, end_date))
 
 @app.route('/api/reservations')
 def reservations():
@@ -394,57 +457,11 @@ def reservations():
     if not allotment_block_code:
         return jsonify({'success': False, 'error': 'allotmentBlockCode parameter is required'})
     
-    print(f"🚀 Fetching reservations for allotment block: {allotment_block_code}")
-    
     # Get reservations for a date range
     start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
     end_date = (datetime.now() + timedelta(days=90)).strftime('%Y-%m-%d')
     
-    reservations_response = make_api_call(RESERVATIONS_URL, {
-        'propertyID': credentials['property_id'],
-        'checkInFrom': start_date,
-        'checkInTo': end_date,
-        'includeGuestsDetails': 'true'
-    }, credentials)
-    
-    if not reservations_response['success']:
-        return jsonify({'success': False, 'error': f"Failed to fetch reservations: {reservations_response['error']}"})
-    
-    all_reservations = reservations_response['data'].get('data', [])
-    print(f"Found {len(all_reservations)} total reservations in date range")
-    
-    # Filter reservations that match the allotment block code
-    filtered_reservations = [
-        res for res in all_reservations 
-        if res.get('allotmentBlockCode') == allotment_block_code
-    ]
-    
-    print(f"Found {len(filtered_reservations)} reservations for allotment block {allotment_block_code}")
-    
-    # Fetch detailed information for each reservation
-    detailed_reservations = []
-    for reservation in filtered_reservations:
-        reservation_id = reservation.get('reservationID')
-        if reservation_id:
-            print(f"Fetching details for reservation: {reservation_id}")
-            
-            detail_response = make_api_call(RESERVATION_DETAIL_URL, {
-                'propertyID': credentials['property_id'],
-                'reservationID': reservation_id
-            }, credentials)
-            
-            if detail_response['success']:
-                detailed_data = detail_response['data'].get('data', {})
-                # Merge the detailed data with the basic reservation data
-                merged_reservation = {**reservation, **detailed_data}
-                detailed_reservations.append(merged_reservation)
-            else:
-                print(f"Failed to fetch details for reservation {reservation_id}: {detail_response['error']}")
-                detailed_reservations.append(reservation)
-        else:
-            detailed_reservations.append(reservation)
-    
-    return jsonify({'success': True, 'data': detailed_reservations})
+    return jsonify(fetch_block_reservations(credentials, allotment_block_code, start_date, end_date))
 
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Headless report runner for scheduled jobs
+Generates group allotment reports without starting the web server or browser
+
+Examples:
+    python report_cli.py --range 2025-01-01 2025-03-31 --output-dir reports
+    python report_cli.py --property-id 6000 --property-id 6001 --days-ahead 90 --include-reservations
+    python report_cli.py --jobs-file nightly_jobs.json --workers 8
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from main import (
+    get_credentials,
+    make_api_call,
+    fetch_group_allotment_report,
+    fetch_block_reservations,
+)
+
+ALLOTMENT_CSV_HEADER = [
+    'Group Name', 'Group Code', 'Block Name', 'Block Code', 'Block Status', 'Date', 'Room Type',
+    'Rate', 'Allotted', 'Confirmed', 'Remaining', 'Pickup %', 'Actual Revenue', 'Forecasted Revenue'
+]
+
+RESERVATION_CSV_HEADER = [
+    'Group Name', 'Group Code', 'Block Name', 'Block Code', 'Reservation ID', 'Guest Name', 'Check-in',
+    'Check-out', 'Nights', 'Adults', 'Children', 'Room Type', 'Room Number', 'Status', 'Total Amount'
+]
+
+class CachedApiClient:
+    """Thread-safe wrapper around make_api_call sharing one pooled session and a response cache
+
+    Identical requests made during a run are only sent once. Rate-limited, timed out and
+    connection-failed calls are retried with exponential backoff; once the retries are used up
+    the failure is cached too, so jobs waiting on the same call do not send it again. At most
+    max_in_flight requests are sent at the same time.
+    """
+
+    def __init__(self, max_in_flight=4, max_retries=3, backoff_seconds=2):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_in_flight, pool_maxsize=max_in_flight)
+        self.session.mount('https://', adapter)
+        self._results = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    def __call__(self, url, params, credentials):
+        key = (url, credentials['api_key'], tuple(sorted(params.items())))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Hold the per-request lock so concurrent callers wait for the first response
+        with key_lock:
+            if key in self._results:
+                return self._results[key]
+            for attempt in range(self.max_retries + 1):
+                with self._in_flight:
+                    result = make_api_call(url, params, credentials, session=self.session)
+                if result['success'] or not result.get('retryable') or attempt == self.max_retries:
+                    break
+                delay = self.backoff_seconds * 2 ** attempt
+                print(f"⏳ {result['error']} Retrying in {delay}s ({attempt + 1}/{self.max_retries})...")
+                time.sleep(delay)
+            self._results[key] = result
+            return result
+
+    def close(self):
+        self.session.close()
+
+def build_jobs(args, credentials):
+    """Build the list of report jobs from a jobs file or command-line options"""
+    if args.jobs_file:
+        try:
+            with open(args.jobs_file, 'r') as f:
+                raw_jobs = json.load(f)
+        except Exception as e:
+            raise ValueError(f"Could not load jobs file {args.jobs_file}: {e}")
+        if not isinstance(raw_jobs, list):
+            raise ValueError("Jobs file must contain a JSON list of jobs")
+    else:
+        property_ids = args.property_id or [credentials['property_id']]
+        date_ranges = list(args.range or [])
+        if args.days_ahead is not None:
+            today = datetime.now()
+            date_ranges.append((
+                today.strftime('%Y-%m-%d'),
+                (today + timedelta(days=args.days_ahead)).strftime('%Y-%m-%d')
+            ))
+        if not date_ranges:
+            raise ValueError("Provide at least one --range, --days-ahead or a --jobs-file")
+        raw_jobs = [
+            {'property_id': property_id, 'start_date': start_date, 'end_date': end_date}
+            for property_id in property_ids
+            for start_date, end_date in date_ranges
+        ]
+
+    jobs = []
+    for raw_job in raw_jobs:
+        if not isinstance(raw_job, dict):
+            raise ValueError(f"Invalid job definition: {raw_job!r}")
+        property_id = str(raw_job.get('property_id') or credentials['property_id'])
+        dates = []
+        for value in (raw_job.get('start_date'), raw_job.get('end_date')):
+            try:
+                dates.append(datetime.strptime(str(value), '%Y-%m-%d').date())
+            except ValueError:
+                raise ValueError(f"Invalid date {value!r} in job for property {property_id} (expected YYYY-MM-DD)")
+        # Store canonical zero-padded dates for the API and the default folder name
+        start_date, end_date = (date.strftime('%Y-%m-%d') for date in dates)
+        if dates[0] > dates[1]:
+            raise ValueError(f"Start date {start_date} is after end date {end_date} in job for property {property_id}")
+        name = raw_job.get('name') or f"{property_id}_{start_date}_{end_date}"
+        if not isinstance(name, str) or name in ('.', '..') or '/' in name or '\\' in name:
+            raise ValueError(f"Invalid job name {name!r} - names are used as folder names and cannot contain path separators")
+        if any(job['name'] == name for job in jobs):
+            raise ValueError(f"Duplicate job {name!r} - each job needs its own output folder")
+        include_reservations = raw_job.get('include_reservations', args.include_reservations)
+        if not isinstance(include_reservations, bool):
+            raise ValueError(f"include_reservations must be true or false in job {name!r}")
+        jobs.append({
+            'name': name,
+            'credentials': {
+                'api_key': raw_job.get('api_key') or credentials['api_key'],
+                'property_id': property_id
+            },
+            'start_date': start_date,
+            'end_date': end_date,
+            'include_reservations': include_reservations
+        })
+    return jobs
+
+def fetch_report_reservations(job, report_data, api_call, executor):
+    """Fetch reservations for every allotment block in a report, one block per worker
+
+    Returns the reservations per block and the errors for blocks that could not be fetched.
+    """
+    futures = []
+    for group in report_data['groups']:
+        for block in group['allotment_blocks']:
+            if not block.get('code'):
+                continue
+            future = executor.submit(
+                fetch_block_reservations, job['credentials'], block['code'],
+                job['start_date'], job['end_date'], api_call, strict=True
+            )
+            futures.append((group, block, future))
+
+    block_reservations = []
+    errors = []
+    for group, block, future in futures:
+        result = future.result()
+        if not result['success']:
+            errors.append(f"Block {block['code']}: {result['error']}")
+            continue
+        block_reservations.append({
+            'group_name': group.get('display_name') or f"{group['name']} ({group['code']})",
+            'group_code': group['code'],
+            'block_name': block['name'],
+            'block_code': block['code'],
+            'reservations': result['data']
+        })
+    return block_reservations, errors
+
+def parse_reservation_date(value):
+    """Parse the date part of a reservation date field, returning None if missing or invalid"""
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def get_room_type(reservation):
+    """Room type of the first assigned (or unassigned) room, as shown on the dashboard"""
+    rooms = reservation.get('assigned') or reservation.get('unassigned') or []
+    if not rooms or not isinstance(rooms[0], dict):
+        return '-'
+    room = rooms[0]
+    return room.get('roomTypeName') or room.get('roomType') or room.get('subRoomName') or '-'
+
+def get_room_number(reservation):
+    """Room number of the first assigned room, as shown on the dashboard"""
+    rooms = reservation.get('assigned') or []
+    if not rooms or not isinstance(rooms[0], dict):
+        return 'Unassigned'
+    room = rooms[0]
+    return room.get('roomName') or room.get('roomNumber') or room.get('room') or '-'
+
+def format_number(value):
+    """Format a number the way the dashboard export does (100.0 -> 100, 99.5 -> 99.5)"""
+    return int(value) if float(value).is_integer() else value
+
+def write_allotments_csv(path, report_data):
+    """Write the allotment blocks detail in the same layout as the dashboard export"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ALLOTMENT_CSV_HEADER)
+        for group in report_data['groups']:
+            display_name = group.get('display_name') or f"{group['name']} ({group['code']})"
+            for block in group['allotment_blocks']:
+                for date_info in block['dates_data']:
+                    for room in date_info['room_types']:
+                        rate = room.get('rate') or 0
+                        writer.writerow([
+                            display_name,
+                            group['code'],
+                            block['name'],
+                            block.get('code') or '',
+                            block.get('status') or '',
+                            date_info['date'],
+                            room['room_type_id'],
+                            format_number(rate),
+                            room.get('block_allotted') or 0,
+                            room.get('block_confirmed') or 0,
+                            room.get('block_remaining') or 0,
+                            format_number(room.get('pickup_percentage') or 0),
+                            f"{(room.get('block_confirmed') or 0) * rate:.2f}",
+                            f"{(room.get('block_allotted') or 0) * rate:.2f}"
+                        ])
+
+def write_reservations_csv(path, block_reservations):
+    """Write the reservations detail in the same layout as the dashboard export"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(RESERVATION_CSV_HEADER)
+        for block in block_reservations:
+            for reservation in block['reservations']:
+                check_in = parse_reservation_date(reservation.get('startDate'))
+                check_out = parse_reservation_date(reservation.get('endDate'))
+                nights = (check_out - check_in).days if check_in and check_out else 0
+                writer.writerow([
+                    block['group_name'],
+                    block['group_code'],
+                    block['block_name'],
+                    block['block_code'],
+                    reservation.get('reservationID') or '',
+                    reservation.get('guestName') or 'Guest Name Not Available',
+                    check_in.strftime('%m/%d/%Y') if check_in else '-',
+                    check_out.strftime('%m/%d/%Y') if check_out else '-',
+                    nights if nights > 0 else '-',
+                    reservation.get('adults') or 0,
+                    reservation.get('children') or 0,
+                    get_room_type(reservation),
+                    get_room_number(reservation),
+                    reservation.get('status') or '',
+                    reservation.get('total') or reservation.get('balance') or 0
+                ])
+
+def run_job(job, api_call, reservations_executor, output_dir, output_format):
+    """Generate a single report and write its output files"""
+    report_response = fetch_group_allotment_report(
+        job['credentials'], job['start_date'], job['end_date'], api_call
+    )
+    if not report_response['success']:
+        return {'name': job['name'], 'success': False, 'error': report_response['error']}
+
+    report_data = report_response['data']
+    block_reservations = None
+    if job['include_reservations']:
+        block_reservations, errors = fetch_report_reservations(job, report_data, api_call, reservations_executor)
+        if errors:
+            return {'name': job['name'], 'success': False,
+                    'error': f"Failed to fetch reservations for {len(errors)} block(s): {'; '.join(errors)}"}
+
+    job_dir = output_dir / job['name']
+    job_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+
+    if output_format in ('json', 'both'):
+        output = {
+            'property_id': job['credentials']['property_id'],
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'report': report_data
+        }
+        if block_reservations is not None:
+            output['reservations'] = block_reservations
+        path = job_dir / 'report.json'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+        files.append(str(path))
+
+    if output_format in ('csv', 'both'):
+        path = job_dir / 'allotments.csv'
+        write_allotments_csv(path, report_data)
+        files.append(str(path))
+        if block_reservations is not None:
+            path = job_dir / 'reservations.csv'
+            write_reservations_csv(path, block_reservations)
+            files.append(str(path))
+
+    return {'name': job['name'], 'success': True, 'files': files}
+
+def run_jobs(jobs, output_dir, output_format='both', workers=4):
+    """Run report jobs concurrently, sharing one cached API client between them
+
+    No more than `workers` API requests are in flight at once across all jobs.
+    """
+    api_call = CachedApiClient(max_in_flight=workers)
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as reservations_executor, \
+                ThreadPoolExecutor(max_workers=workers) as jobs_executor:
+            futures = [
+                jobs_executor.submit(run_job, job, api_call, reservations_executor, output_dir, output_format)
+                for job in jobs
+            ]
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({'name': job['name'], 'success': False, 'error': str(e)})
+    finally:
+        api_call.close()
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate Cloudbeds group allotment reports without starting the web app."
+    )
+    parser.add_argument('--range', nargs=2, action='append', metavar=('START_DATE', 'END_DATE'),
+                        help="Report date range (YYYY-MM-DD); may be repeated")
+    parser.add_argument('--days-ahead', type=int,
+                        help="Add a range from today through the given number of days ahead")
+    parser.add_argument('--property-id', action='append',
+                        help="Property ID to report on; may be repeated (default: saved settings)")
+    parser.add_argument('--jobs-file',
+                        help="JSON list of jobs with property_id, start_date, end_date and optional "
+                             "name, api_key and include_reservations")
+    parser.add_argument('--api-key', default=os.environ.get('CLOUDBEDS_API_KEY'),
+                        help="API key (default: CLOUDBEDS_API_KEY or saved settings)")
+    parser.add_argument('--include-reservations', action='store_true',
+                        help="Also fetch reservations checking in within each job's date range "
+                             "(the dashboard uses 90 days either side of today)")
+    parser.add_argument('--output-dir', default='reports', help="Directory for report files (default: reports)")
+    parser.add_argument('--format', choices=['json', 'csv', 'both'], default='both',
+                        help="Output file format (default: both)")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of concurrent API requests across all jobs (default: 4)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    # Scheduled runs often redirect output to a file using a legacy code page (e.g. cp1252 on
+    # Windows), which cannot encode the emoji in the progress messages
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8', errors='replace')
+
+    args = parse_args(argv)
+
+    credentials = get_credentials()
+    if args.api_key:
+        credentials['api_key'] = args.api_key.strip()
+
+    if not credentials['api_key'] or not credentials['api_key'].strip():
+        print("❌ API credentials not configured. Use --api-key, CLOUDBEDS_API_KEY or the app settings.")
+        return 2
+
+    if args.workers < 1:
+        print("❌ --workers must be at least 1")
+        return 2
+
+    try:
+        jobs = build_jobs(args, credentials)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+
+    print(f"🏨 Running {len(jobs)} report job(s) with {args.workers} worker(s)")
+    results = run_jobs(jobs, Path(args.output_dir), args.format, args.workers)
+
+    failed = [result for result in results if not result['success']]
+    for result in results:
+        if result['success']:
+            print(f"✅ {result['name']}: {', '.join(result['files'])}")
+        else:
+            print(f"❌ {result['name']}: {result['error']}")
+
+    print(f"\n📊 {len(results) - len(failed)} of {len(results)} report job(s) succeeded")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())